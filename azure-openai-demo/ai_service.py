@@ -0,0 +1,656 @@
+"""
+AI Service Layer for Azure OpenAI Integration
+Handles different types of AI interactions: chat, document Q&A, summarization, etc.
+"""
+
+import asyncio
+import collections
+import hashlib
+import itertools
+import json
+import logging
+import sys
+import textwrap
+from typing import Deque, Dict, List, Any, Optional, AsyncGenerator
+from datetime import datetime
+
+import cachetools
+import orjson
+import tiktoken
+from openai import BadRequestError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+from config import config
+
+# Token budget for an entire request (history + prompts + completion)
+# and the per-message protocol overhead the chat format adds
+_MAX_CONTEXT_TOKENS = 8192
+_TOKENS_PER_MESSAGE = 4
+
+# Documents above this many tokens are summarized map-reduce style in
+# chunks of the same size rather than in one oversized prefill
+_SUMMARIZE_CHUNK_TOKENS = 6000
+
+# Session ids come from clients, so the per-session stores are LRU-bounded
+# to keep an id-churning client from growing process memory without limit
+_MAX_SESSIONS = 10_000
+
+# Static system prompts, dedented once at import so leading indentation is
+# never sent (or billed) with a request; interned so cache keys can compare
+# them by identity
+_SUMMARIZE_SYS = sys.intern(textwrap.dedent("""\
+    You are an expert document summarizer. Create a concise, informative summary
+    of the provided text in approximately {max_length} words. Focus on key points,
+    main arguments, and important details.""").strip())
+
+_SENTIMENT_SYS = sys.intern(textwrap.dedent("""\
+    You are a sentiment analysis expert. Analyze the sentiment of the provided text
+    and return your response as a JSON object with the following structure:
+    {
+        "sentiment": "positive|negative|neutral",
+        "confidence": 0.0-1.0,
+        "emotions": ["emotion1", "emotion2"],
+        "explanation": "brief explanation"
+    }""").strip())
+
+_SUMMARIZE_PARTIAL_SYS = sys.intern(textwrap.dedent("""\
+    You are an expert document summarizer. The user will provide one section
+    of a longer document. Create a detailed partial summary of the section,
+    preserving key points, main arguments, and important details.""").strip())
+
+_SENTIMENT_BATCH_SYS = sys.intern(textwrap.dedent("""\
+    You are a sentiment analysis expert. You will receive several texts,
+    each prefixed with its index in square brackets. Analyze the sentiment
+    of each text and return your response as a JSON array where entry i
+    corresponds to text [i] and has the following structure:
+    {
+        "sentiment": "positive|negative|neutral",
+        "confidence": 0.0-1.0,
+        "emotions": ["emotion1", "emotion2"],
+        "explanation": "brief explanation"
+    }""").strip())
+
+_SUMMARIZE_BATCH_SYS = sys.intern(textwrap.dedent("""\
+    You are an expert document summarizer. You will receive several
+    documents, each prefixed with its index in square brackets. Create a
+    concise, informative summary of each one in approximately {max_length}
+    words and return your response as a JSON array of strings where entry
+    i is the summary of document [i].""").strip())
+
+_CODE_SYS = sys.intern(textwrap.dedent("""\
+    You are an expert {language} developer. Generate clean, well-commented,
+    production-ready code based on the user's description. Include error handling
+    where appropriate and follow best practices.""").strip())
+
+# Strict schema for sentiment analysis; server-side constrained decoding
+# guarantees valid JSON so the parse-failure fallback becomes dead code
+_SENTIMENT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "sentiment",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "sentiment": {"enum": ["positive", "negative", "neutral"]},
+                "confidence": {"type": "number"},
+                "emotions": {"type": "array", "items": {"type": "string"}},
+                "explanation": {"type": "string"}
+            },
+            "required": ["sentiment", "confidence", "emotions", "explanation"],
+            "additionalProperties": False
+        }
+    }
+}
+
+
+class AIService:
+    """Service class for AI operations using Azure OpenAI"""
+
+    def __init__(self):
+        self._config = config
+        self.deployment_name = config.deployment_name
+        self.logger = logging.getLogger(__name__)
+
+        # Conversation context for multi-turn chat, keyed by session so
+        # concurrent users never interleave turns; each deque auto-evicts
+        # the oldest turns
+        self._conversations: cachetools.LRUCache = cachetools.LRUCache(
+            maxsize=_MAX_SESSIONS)
+        # tiktoken encoder, created lazily on first use
+        self._encoder = None
+
+        # Content-addressed cache for effectively-deterministic calls
+        # (low temperature), so identical inputs skip the network entirely
+        self._cache = cachetools.TTLCache(maxsize=10_000, ttl=3600)
+
+    @property
+    def client(self):
+        """The shared Azure OpenAI client, created lazily on first use"""
+        return self._config.client
+
+    def _history(self, session_id: str) -> Deque[Dict[str, str]]:
+        """Conversation history deque for a session, created on first use"""
+        return self._conversations.setdefault(
+            session_id, collections.deque(maxlen=20)
+        )
+
+    async def _cached_call(self, key_parts: tuple, func):
+        """
+        Run an LLM call through the content-addressed TTL cache
+
+        Args:
+            key_parts: Tuple identifying the call (model, prompts, params)
+            func: Zero-argument coroutine function performing the real call
+
+        Returns:
+            Cached result on hit, otherwise the freshly-computed result
+        """
+        key = hashlib.blake2b(repr(key_parts).encode(), digest_size=16).digest()
+        if key in self._cache:
+            return self._cache[key]
+
+        result = await func()
+        self._cache[key] = result
+        return result
+
+    @property
+    def encoder(self):
+        """tiktoken encoder for the configured deployment"""
+        if self._encoder is None:
+            try:
+                self._encoder = tiktoken.encoding_for_model(self.deployment_name)
+            except KeyError:
+                self._encoder = tiktoken.get_encoding("cl100k_base")
+        return self._encoder
+
+    def _message_tokens(self, message: Dict[str, str]) -> int:
+        """Token count of a history message, memoized on the message itself"""
+        if "_tok" not in message:
+            message["_tok"] = len(self.encoder.encode(message["content"]))
+        return message["_tok"]
+
+    def _select_history(self, session_id: str, budget: int) -> List[Dict[str, str]]:
+        """
+        Most recent history messages that fit within a token budget
+
+        Walks the session history newest-first, accumulating token counts,
+        and stops before the budget is exceeded so the request can never
+        blow past the model's context window.
+        """
+        selected = []
+        remaining = budget
+        for msg in reversed(self._history(session_id)):
+            cost = self._message_tokens(msg) + _TOKENS_PER_MESSAGE
+            if cost > remaining:
+                break
+            selected.append({"role": msg["role"], "content": msg["content"]})
+            remaining -= cost
+
+        selected.reverse()
+        return selected
+
+    def _build_messages(self, message: str, system_prompt: Optional[str],
+                        max_tokens: int, session_id: str) -> List[Dict[str, str]]:
+        """Assemble the request messages within the model's token budget"""
+        messages = []
+
+        budget = _MAX_CONTEXT_TOKENS - max_tokens
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+            budget -= len(self.encoder.encode(system_prompt)) + _TOKENS_PER_MESSAGE
+        budget -= len(self.encoder.encode(message)) + _TOKENS_PER_MESSAGE
+
+        # Include as much recent conversation context as the budget allows
+        messages.extend(self._select_history(session_id, budget))
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    async def chat_completion(self, message: str, system_prompt: Optional[str] = None,
+                              max_tokens: int = 1000, temperature: float = 0.7,
+                              session_id: str = "default") -> str:
+        """
+        Generate chat completion with conversation context
+
+        Args:
+            message: User message
+            system_prompt: Optional system prompt to set behavior
+            max_tokens: Maximum tokens in response
+            temperature: Creativity level (0.0-1.0)
+            session_id: Conversation session the turn belongs to
+
+        Returns:
+            AI response as string
+        """
+        try:
+            messages = self._build_messages(message, system_prompt, max_tokens, session_id)
+
+            response = await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            ai_response = response.choices[0].message.content
+            self._update_conversation_history(session_id, message, ai_response)
+            if response.usage:
+                self._log_usage(response.usage)
+            return ai_response
+
+        except Exception as e:
+            self.logger.error("Chat completion failed: %s", e)
+            raise
+
+    async def stream_sse(self, message: str, system_prompt: Optional[str] = None,
+                         max_tokens: int = 1000, temperature: float = 0.7,
+                         session_id: str = "default") -> AsyncGenerator[bytes, None]:
+        """
+        Stream a chat completion as ready-to-send SSE frames
+
+        Formats each delta straight off the OpenAI stream into a
+        `data: {...}` frame, so there is a single generator hop per token
+        instead of one wrapper per layer.
+        """
+        messages = self._build_messages(message, system_prompt, max_tokens, session_id)
+
+        try:
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.deployment_name,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+            except BadRequestError:
+                # Older API versions reject stream_options; retry without usage
+                response = await self.client.chat.completions.create(
+                    model=self.deployment_name,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True
+                )
+
+            parts = []
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    parts.append(content)
+                    yield b"data: " + orjson.dumps({"content": content}) + b"\n\n"
+                # The final chunk carries usage when stream_options asked for it
+                if getattr(chunk, "usage", None):
+                    self._log_usage(chunk.usage)
+
+            self._update_conversation_history(session_id, message, "".join(parts))
+            yield b"data: " + orjson.dumps({"done": True}) + b"\n\n"
+        except Exception as e:
+            self.logger.error("Streaming response failed: %s", e)
+            yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
+
+    async def summarize_document(self, text: str, max_length: int = 500) -> str:
+        """
+        Summarize a document using AI
+
+        Args:
+            text: Document text to summarize
+            max_length: Maximum length of summary
+
+        Returns:
+            Document summary
+        """
+        system_prompt = _SUMMARIZE_SYS.format(max_length=max_length)
+
+        async def _call():
+            # Oversized documents go through map-reduce so one giant
+            # prefill never overflows the context window
+            if len(self.encoder.encode(text)) > _SUMMARIZE_CHUNK_TOKENS:
+                return await self._summarize_map_reduce(text, max_length)
+
+            response = await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Please summarize this document:\n\n{text}"}
+                ],
+                max_tokens=max_length * 2,
+                temperature=0.3
+            )
+            return response.choices[0].message.content
+
+        try:
+            return await self._cached_call(
+                ("summarize", self.deployment_name, max_length, text), _call
+            )
+        except Exception as e:
+            self.logger.error("Document summarization failed: %s", e)
+            raise
+
+    def _chunk_by_tokens(self, text: str,
+                         chunk_tokens: int = _SUMMARIZE_CHUNK_TOKENS) -> List[str]:
+        """Split text into pieces of at most chunk_tokens tokens"""
+        tokens = self.encoder.encode(text)
+        return [
+            self.encoder.decode(tokens[i:i + chunk_tokens])
+            for i in range(0, len(tokens), chunk_tokens)
+        ]
+
+    async def _summarize_map_reduce(self, text: str, max_length: int) -> str:
+        """
+        Summarize an oversized document via map-reduce
+
+        Each chunk is summarized concurrently (bounded by the fan-out
+        semaphore), then the concatenated partial summaries are reduced
+        into a single summary at the requested length.
+        """
+        chunks = self._chunk_by_tokens(text)
+        tasks = [
+            (
+                [
+                    {"role": "system", "content": _SUMMARIZE_PARTIAL_SYS},
+                    {"role": "user", "content": f"Summarize this section:\n\n{chunk}"}
+                ],
+                600,
+                0.3
+            )
+            for chunk in chunks
+        ]
+        partials = await self._gather_completions(tasks)
+
+        combined = "\n\n".join(partials)
+        # A very large document can produce more partials than fit one
+        # reduce prompt; fold them through another map-reduce level. Each
+        # level shrinks the text ~10x (600-token partials per 6000-token
+        # chunk), so the recursion terminates quickly.
+        if len(self.encoder.encode(combined)) > _SUMMARIZE_CHUNK_TOKENS:
+            return await self._summarize_map_reduce(combined, max_length)
+
+        response = await self.client.chat.completions.create(
+            model=self.deployment_name,
+            messages=[
+                {"role": "system", "content": _SUMMARIZE_SYS.format(max_length=max_length)},
+                {"role": "user", "content": f"Please summarize this document:\n\n{combined}"}
+            ],
+            max_tokens=max_length * 2,
+            temperature=0.3
+        )
+        return response.choices[0].message.content
+
+    @staticmethod
+    def _sentiment_fallback() -> Dict[str, Any]:
+        """Neutral placeholder returned when sentiment output can't be parsed"""
+        return {
+            "sentiment": "neutral",
+            "confidence": 0.0,
+            "emotions": [],
+            "explanation": "Analysis failed"
+        }
+
+    async def analyze_sentiment(self, text: str) -> Dict[str, Any]:
+        """
+        Analyze sentiment of text
+
+        Args:
+            text: Text to analyze
+
+        Returns:
+            Dictionary with sentiment analysis results
+        """
+        system_prompt = _SENTIMENT_SYS
+
+        async def _call():
+            response = await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Analyze sentiment: {text}"}
+                ],
+                max_tokens=300,
+                temperature=0.1,
+                response_format=_SENTIMENT_RESPONSE_FORMAT
+            )
+            return orjson.loads(response.choices[0].message.content)
+
+        try:
+            return await self._cached_call(
+                ("sentiment", self.deployment_name, text), _call
+            )
+        except json.JSONDecodeError as e:
+            self.logger.error("Failed to parse sentiment analysis JSON: %s", e)
+            return self._sentiment_fallback()
+        except Exception as e:
+            self.logger.error("Sentiment analysis failed: %s", e)
+            raise
+
+    async def _gather_completions(self, tasks: List[tuple], max_in_flight: int = 20,
+                                  politeness: float = 0.0) -> List[str]:
+        """
+        Run independent chat completions concurrently
+
+        Each task is a (messages, max_tokens, temperature) tuple. In-flight
+        requests are bounded by a semaphore and individual calls retry with
+        exponential backoff when Azure responds with 429.
+
+        Args:
+            tasks: (messages, max_tokens, temperature) tuples
+            max_in_flight: Maximum concurrent requests
+            politeness: Optional delay after each request
+
+        Returns:
+            List of completion texts in task order
+        """
+        sem = asyncio.BoundedSemaphore(max_in_flight)
+
+        @retry(retry=retry_if_exception_type(RateLimitError),
+               wait=wait_exponential(multiplier=1, max=30),
+               stop=stop_after_attempt(5))
+        async def _complete(messages, max_tokens, temperature):
+            response = await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            return response.choices[0].message.content
+
+        async def _bounded(task):
+            messages, max_tokens, temperature = task
+            async with sem:
+                result = await _complete(messages, max_tokens, temperature)
+                if politeness:
+                    await asyncio.sleep(politeness)
+                return result
+
+        return await asyncio.gather(*[_bounded(task) for task in tasks])
+
+    async def chat_completion_batch(self, requests: List[Dict[str, Any]],
+                                    max_in_flight: int = 20) -> List[str]:
+        """
+        Answer several independent prompts concurrently
+
+        Unlike the packed batch endpoints, each request keeps its own system
+        prompt and sampling parameters; the calls just overlap on the wire.
+
+        Args:
+            requests: Dicts with 'message' and optional 'system_prompt',
+                'max_tokens', 'temperature'
+            max_in_flight: Maximum concurrent requests
+
+        Returns:
+            List of responses in request order
+        """
+        tasks = []
+        for req in requests:
+            messages = []
+            if req.get("system_prompt"):
+                messages.append({"role": "system", "content": req["system_prompt"]})
+            messages.append({"role": "user", "content": req["message"]})
+            tasks.append((messages, req.get("max_tokens", 1000), req.get("temperature", 0.7)))
+
+        return await self._gather_completions(tasks, max_in_flight=max_in_flight)
+
+    async def analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Analyze sentiment of several texts in a single request
+
+        Packing the texts into one prompt means the system prompt is sent
+        (and billed) once and only one rate-limit slot is consumed.
+
+        Args:
+            texts: Texts to analyze
+
+        Returns:
+            List of sentiment analysis results, one per input text
+        """
+        system_prompt = _SENTIMENT_BATCH_SYS
+
+        numbered = "\n\n".join(f"[{i}] {text}" for i, text in enumerate(texts))
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Analyze sentiment:\n\n{numbered}"}
+                ],
+                max_tokens=300 * len(texts),
+                temperature=0.1
+            )
+
+            results = orjson.loads(response.choices[0].message.content)
+            if not isinstance(results, list):
+                results = []
+            if len(results) != len(texts):
+                # A short or reordered reply must not silently misalign
+                # results with inputs; pad (or truncate) to the input count
+                self.logger.error(
+                    "Batch sentiment result count mismatch: expected %s, got %s",
+                    len(texts), len(results)
+                )
+                results = (results + [self._sentiment_fallback()] * len(texts))[:len(texts)]
+            return results
+        except json.JSONDecodeError as e:
+            self.logger.error("Failed to parse batch sentiment JSON: %s", e)
+            return [self._sentiment_fallback() for _ in texts]
+        except Exception as e:
+            self.logger.error("Batch sentiment analysis failed: %s", e)
+            raise
+
+    async def summarize_document_batch(self, texts: List[str],
+                                       max_length: int = 500) -> List[str]:
+        """
+        Summarize several documents in a single request
+
+        Args:
+            texts: Document texts to summarize
+            max_length: Maximum length of each summary
+
+        Returns:
+            List of summaries, one per input text
+        """
+        system_prompt = _SUMMARIZE_BATCH_SYS.format(max_length=max_length)
+
+        numbered = "\n\n".join(f"[{i}] {text}" for i, text in enumerate(texts))
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Summarize these documents:\n\n{numbered}"}
+                ],
+                max_tokens=max_length * 2 * len(texts),
+                temperature=0.3
+            )
+            summaries = orjson.loads(response.choices[0].message.content)
+            if not isinstance(summaries, list):
+                summaries = []
+            if len(summaries) != len(texts):
+                # A short or reordered reply must not silently misalign
+                # summaries with inputs; pad (or truncate) to the input count
+                self.logger.error(
+                    "Batch summary count mismatch: expected %s, got %s",
+                    len(texts), len(summaries)
+                )
+                summaries = (summaries + ["Summarization failed"] * len(texts))[:len(texts)]
+            return summaries
+        except json.JSONDecodeError as e:
+            self.logger.error("Failed to parse batch summary JSON: %s", e)
+            return ["Summarization failed" for _ in texts]
+        except Exception as e:
+            self.logger.error("Batch summarization failed: %s", e)
+            raise
+
+    async def generate_code(self, description: str, language: str = "python") -> str:
+        """
+        Generate code based on description
+
+        Args:
+            description: Description of what the code should do
+            language: Programming language
+
+        Returns:
+            Generated code
+        """
+        system_prompt = _CODE_SYS.format(language=language)
+
+        async def _call():
+            response = await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Generate {language} code: {description}"}
+                ],
+                max_tokens=1500,
+                temperature=0.2
+            )
+            return response.choices[0].message.content
+
+        try:
+            return await self._cached_call(
+                ("generate_code", self.deployment_name, language, description), _call
+            )
+        except Exception as e:
+            self.logger.error("Code generation failed: %s", e)
+            raise
+
+    def _update_conversation_history(self, session_id: str, user_message: str,
+                                     ai_response: str):
+        """Update a session's conversation history for context.
+
+        The paired append runs synchronously on the event loop (no await
+        between the two), so a turn is recorded atomically and concurrent
+        turns in one session interleave as whole user/assistant pairs.
+        """
+        history = self._history(session_id)
+        history.append({"role": "user", "content": user_message})
+        history.append({"role": "assistant", "content": ai_response})
+
+    def _log_usage(self, usage):
+        """Log token usage for monitoring and cost tracking"""
+        self.logger.info(
+            "Token usage - Prompt: %s, Completion: %s, Total: %s",
+            usage.prompt_tokens, usage.completion_tokens, usage.total_tokens
+        )
+
+    def clear_conversation(self, session_id: str = "default"):
+        """Clear a session's conversation history"""
+        self._conversations.pop(session_id, None)
+        self.logger.info("Conversation history cleared")
+
+    def get_conversation_summary(self, session_id: str = "default") -> Dict[str, Any]:
+        """Get summary of a session's conversation"""
+        history = self._conversations.get(session_id, ())
+        return {
+            "message_count": len(history),
+            "started_at": datetime.now().isoformat() if history else None,
+            # Copy without underscore-prefixed internals (the _tok memo)
+            # so bookkeeping never leaks into API responses
+            "last_messages": [
+                {k: v for k, v in message.items() if not k.startswith("_")}
+                for message in itertools.islice(
+                    history, max(0, len(history) - 4), None
+                )
+            ]
+        }
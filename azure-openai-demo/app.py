@@ -0,0 +1,441 @@
+"""
+Quart Web Application for Azure OpenAI Demo
+Provides async REST API endpoints for chat, summarization, sentiment analysis,
+code generation, and document upload.
+"""
+
+import gzip
+import hashlib
+import os
+import logging
+import re
+import time
+from datetime import datetime
+
+import cachetools
+import orjson
+from quart import Quart, request, jsonify, Response
+from quart.json.provider import JSONProvider
+from quart_cors import cors
+from werkzeug.utils import secure_filename
+from dotenv import load_dotenv
+
+from ai_service import AIService
+from config import config
+from document_processor import DocumentProcessor
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson for faster (de)serialization"""
+
+    def dumps(self, object_, **kwargs):
+        return orjson.dumps(object_).decode()
+
+    def loads(self, object_, **kwargs):
+        return orjson.loads(object_)
+
+
+app = cors(Quart(__name__))
+app.json = OrjsonProvider(app)
+
+# Upload configuration
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16777216))  # 16MB
+ALLOWED_EXTENSIONS = {'txt', 'pdf'}
+
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# Global AI service instance
+ai_service = AIService()
+
+# Created at import time so that under gunicorn's preload_app the vector
+# store is loaded once in the master and its mmap'd pages are shared
+# copy-on-write by every forked worker.
+processor = DocumentProcessor()
+_vector_store_path = os.getenv('VECTOR_STORE_PATH')
+if _vector_store_path and os.path.isdir(_vector_store_path):
+    processor.load_vector_store(_vector_store_path)
+
+
+# Compiled once at import; avoids a split + lowercase + set lookup per upload
+_EXT_RE = re.compile(r'\.(?:' + '|'.join(ALLOWED_EXTENSIONS) + r')$', re.IGNORECASE)
+
+
+def allowed_file(filename):
+    """Check whether the uploaded file has an allowed extension"""
+    return _EXT_RE.search(filename) is not None
+
+
+# Response timestamps only need second precision, so the formatted string
+# is reused within the same second instead of re-rendering per response.
+_last_iso = (0, '')
+
+
+def _now_iso() -> str:
+    """ISO-8601 timestamp, cached at one-second granularity"""
+    global _last_iso
+    second = int(time.time())
+    if second != _last_iso[0]:
+        _last_iso = (second, datetime.now().isoformat(timespec='seconds'))
+    return _last_iso[1]
+
+
+# Responses smaller than this are cheaper to send raw than to compress
+_COMPRESS_MIN_SIZE = 500
+
+
+@app.after_request
+async def _compress_response(response):
+    """gzip sizeable JSON bodies when the client advertises support.
+
+    Streaming (SSE) responses are exempt: compressing them would buffer
+    the stream and defeat incremental delivery.
+    """
+    if (response.mimetype == 'text/event-stream'
+            or response.headers.get('Content-Encoding')
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+        return response
+
+    body = await response.get_data()
+    if len(body) < _COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers.add('Vary', 'Accept-Encoding')
+    return response
+
+
+# Deep health probes are rate-limited to one real LLM call per TTL window
+_deep_health_cache = cachetools.TTLCache(maxsize=1, ttl=60)
+
+
+@app.route('/api/health', methods=['GET'])
+async def health_check():
+    """Lightweight health check: process is up and configuration is present"""
+    configured = bool(config.endpoint and (config.api_key or config.key_vault_url))
+    return jsonify({
+        'status': 'healthy' if configured else 'unconfigured',
+        'ai_service': 'configured' if configured else 'not configured',
+        'timestamp': _now_iso()
+    }), 200 if configured else 503
+
+
+@app.route('/api/health/deep', methods=['GET'])
+async def health_check_deep():
+    """Readiness probe that makes at most one real LLM call per minute"""
+    if 'probe' in _deep_health_cache:
+        return jsonify({
+            **_deep_health_cache['probe'],
+            'timestamp': _now_iso()
+        })
+
+    try:
+        await config._test_connection(ai_service.client)
+        # Only successful probes are cached so a failing backend is retried
+        _deep_health_cache['probe'] = {'status': 'healthy', 'ai_service': 'connected'}
+        return jsonify({
+            'status': 'healthy',
+            'ai_service': 'connected',
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Deep health check failed: {e}")
+        return jsonify({
+            'status': 'unhealthy',
+            'error': str(e),
+            'timestamp': _now_iso()
+        }), 503
+
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    """Chat endpoint with optional streaming support"""
+    try:
+        data = await request.get_json()
+        if not data or 'message' not in data:
+            return jsonify({'error': 'Message is required'}), 400
+
+        message = data['message']
+        system_prompt = data.get('system_prompt')
+        max_tokens = data.get('max_tokens', 1000)
+        temperature = data.get('temperature', 0.7)
+        stream = data.get('stream', False)
+        session_id = data.get('session_id', 'default')
+
+        if stream:
+            # stream_sse never touches request context, so the generator can
+            # go straight to Response (Quart's stream_with_context is a
+            # decorator for generator functions, not a wrapper for generators)
+            return Response(
+                ai_service.stream_sse(
+                    message,
+                    system_prompt=system_prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    session_id=session_id
+                ),
+                mimetype='text/event-stream',
+                headers={
+                    'Cache-Control': 'no-cache',
+                    'X-Accel-Buffering': 'no'
+                }
+            )
+
+        response = await ai_service.chat_completion(
+            message,
+            system_prompt=system_prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            session_id=session_id
+        )
+        return jsonify({
+            'response': response,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Chat endpoint failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/summarize', methods=['POST'])
+async def summarize():
+    """Summarize a document"""
+    try:
+        data = await request.get_json()
+        if not data or 'text' not in data:
+            return jsonify({'error': 'Text is required'}), 400
+
+        max_length = data.get('max_length', 500)
+        summary = await ai_service.summarize_document(data['text'], max_length=max_length)
+
+        return jsonify({
+            'summary': summary,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Summarize endpoint failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/sentiment', methods=['POST'])
+async def sentiment():
+    """Analyze sentiment of text"""
+    try:
+        data = await request.get_json()
+        if not data or 'text' not in data:
+            return jsonify({'error': 'Text is required'}), 400
+
+        result = await ai_service.analyze_sentiment(data['text'])
+
+        return jsonify({
+            'analysis': result,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Sentiment endpoint failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+MAX_BATCH_SIZE = 32
+
+
+@app.route('/api/chat/batch', methods=['POST'])
+async def chat_batch():
+    """Answer several independent prompts concurrently"""
+    try:
+        data = await request.get_json()
+        requests_list = (data or {}).get('requests')
+        if not isinstance(requests_list, list) or not requests_list:
+            return jsonify({'error': 'A non-empty list of requests is required'}), 400
+        if len(requests_list) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_BATCH_SIZE} requests per batch'}), 400
+        if any(not isinstance(req, dict) or 'message' not in req for req in requests_list):
+            return jsonify({'error': 'Each request needs a message'}), 400
+
+        responses = await ai_service.chat_completion_batch(requests_list)
+
+        return jsonify({
+            'responses': responses,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Batch chat endpoint failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/sentiment/batch', methods=['POST'])
+async def sentiment_batch():
+    """Analyze sentiment of several texts in one LLM request"""
+    try:
+        data = await request.get_json()
+        texts = (data or {}).get('texts')
+        if not isinstance(texts, list) or not texts:
+            return jsonify({'error': 'A non-empty list of texts is required'}), 400
+        if len(texts) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_BATCH_SIZE} texts per batch'}), 400
+
+        results = await ai_service.analyze_sentiment_batch(texts)
+
+        return jsonify({
+            'analyses': results,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Batch sentiment endpoint failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/summarize/batch', methods=['POST'])
+async def summarize_batch():
+    """Summarize several documents in one LLM request"""
+    try:
+        data = await request.get_json()
+        texts = (data or {}).get('texts')
+        if not isinstance(texts, list) or not texts:
+            return jsonify({'error': 'A non-empty list of texts is required'}), 400
+        if len(texts) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_BATCH_SIZE} texts per batch'}), 400
+
+        max_length = (data or {}).get('max_length', 500)
+        summaries = await ai_service.summarize_document_batch(texts, max_length=max_length)
+
+        return jsonify({
+            'summaries': summaries,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Batch summarize endpoint failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/search/batch', methods=['POST'])
+async def search_batch():
+    """Run several document searches in one embedding and index pass"""
+    try:
+        data = await request.get_json()
+        queries = (data or {}).get('queries')
+        if not isinstance(queries, list) or not queries:
+            return jsonify({'error': 'A non-empty list of queries is required'}), 400
+        if len(queries) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_BATCH_SIZE} queries per batch'}), 400
+
+        k = (data or {}).get('k', 3)
+        results = await processor.search_documents_batch(queries, k=k)
+
+        return jsonify({
+            'results': results,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Batch search endpoint failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/generate-code', methods=['POST'])
+async def generate_code():
+    """Generate code from a description"""
+    try:
+        data = await request.get_json()
+        if not data or 'description' not in data:
+            return jsonify({'error': 'Description is required'}), 400
+
+        language = data.get('language', 'python')
+        code = await ai_service.generate_code(data['description'], language=language)
+
+        return jsonify({
+            'code': code,
+            'language': language,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Code generation endpoint failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/upload-document', methods=['POST'])
+async def upload_document():
+    """Upload a document for future RAG processing"""
+    try:
+        files = await request.files
+        if 'file' not in files:
+            return jsonify({'error': 'No file provided'}), 400
+
+        file = files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'File type not allowed'}), 400
+
+        # Content-addressed storage: identical uploads hash to the same
+        # name, so re-uploads are detected without writing a second copy.
+        digest = hashlib.file_digest(file.stream, 'blake2b').hexdigest()
+        file.stream.seek(0)
+
+        extension = os.path.splitext(secure_filename(file.filename))[1].lower()
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], digest + extension)
+
+        if os.path.exists(filepath):
+            status = 'already_uploaded'
+        else:
+            file.save(filepath)
+            status = 'uploaded'
+
+        # NOTE: document processing (chunking + embedding) is temporarily
+        # disabled until the RAG pipeline is production-ready.
+        # processor.add_document(filepath)
+
+        return jsonify({
+            'filename': file.filename,
+            'content_id': digest,
+            'status': status,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Upload endpoint failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/clear-conversation', methods=['POST'])
+async def clear_conversation():
+    """Clear the conversation history"""
+    try:
+        data = await request.get_json(silent=True) or {}
+        ai_service.clear_conversation(data.get('session_id', 'default'))
+        return jsonify({
+            'status': 'cleared',
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Clear conversation failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/conversation-summary', methods=['GET'])
+async def conversation_summary():
+    """Get a summary of the current conversation"""
+    try:
+        session_id = request.args.get('session_id', 'default')
+        summary = ai_service.get_conversation_summary(session_id)
+        return jsonify({
+            'summary': summary,
+            'timestamp': _now_iso()
+        })
+    except Exception as e:
+        logger.error(f"Conversation summary failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+if __name__ == '__main__':
+    debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+    app.run(debug=debug_mode, host='0.0.0.0', port=5000)
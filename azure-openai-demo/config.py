@@ -0,0 +1,119 @@
+"""
+Azure OpenAI Configuration and Client Management
+This module handles Azure OpenAI client setup with proper authentication and error handling.
+"""
+
+import os
+import logging
+import time
+from functools import cached_property
+from typing import Optional
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncAzureOpenAI
+from azure.identity import DefaultAzureCredential, ChainedTokenCredential, ManagedIdentityCredential
+from azure.keyvault.secrets import SecretClient
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Process-global Key Vault access. DefaultAzureCredential probes the whole
+# IMDS/CLI/env chain on construction and SecretClient caches AAD tokens, so
+# both are built once and shared instead of per call.
+_KEY_VAULT_URL = os.getenv("AZURE_KEY_VAULT_URL")
+_SECRET_TTL_SECONDS = 15 * 60
+
+# Shared HTTP transport for all Azure OpenAI traffic. HTTP/2 multiplexes
+# concurrent requests over a single TLS session and the keep-alive pool
+# removes per-request handshake cost on the warm path.
+_http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+    timeout=httpx.Timeout(60.0, connect=5.0)
+)
+
+_credential = None
+_kv_client = None
+if _KEY_VAULT_URL:
+    _credential = ChainedTokenCredential(
+        ManagedIdentityCredential(),
+        DefaultAzureCredential()
+    )
+    _kv_client = SecretClient(vault_url=_KEY_VAULT_URL, credential=_credential)
+
+
+class AzureOpenAIConfig:
+    """Configuration management for Azure OpenAI services"""
+
+    def __init__(self):
+        self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        self.api_key = os.getenv("AZURE_OPENAI_API_KEY")
+        self.api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview")
+        self.deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
+        self.key_vault_url = os.getenv("AZURE_KEY_VAULT_URL")
+
+        # Resolved Key Vault secret, cached with a fetch time so it is
+        # refreshed after _SECRET_TTL_SECONDS instead of on every call
+        self._keyvault_api_key = None
+        self._keyvault_fetched_at = 0.0
+
+        # Logging is configured once by the application entry point;
+        # library modules only grab their named logger.
+        self.logger = logging.getLogger(__name__)
+
+    def get_api_key_from_keyvault(self) -> Optional[str]:
+        """Retrieve API key from Azure Key Vault for production security"""
+        if _kv_client is None:
+            return None
+
+        if (self._keyvault_api_key is not None
+                and time.monotonic() - self._keyvault_fetched_at < _SECRET_TTL_SECONDS):
+            return self._keyvault_api_key
+
+        try:
+            secret = _kv_client.get_secret("openai-api-key")
+            self._keyvault_api_key = secret.value
+            self._keyvault_fetched_at = time.monotonic()
+            return self._keyvault_api_key
+        except Exception as e:
+            self.logger.warning("Failed to retrieve from Key Vault: %s", e)
+            return None
+
+    @cached_property
+    def client(self) -> AsyncAzureOpenAI:
+        """Lazily-created, cached Azure OpenAI client"""
+        try:
+            # Try Key Vault first (production), fall back to environment variable
+            api_key = self.get_api_key_from_keyvault() or self.api_key
+
+            if not api_key or not self.endpoint:
+                raise ValueError("Azure OpenAI API key and endpoint must be configured")
+
+            client = AsyncAzureOpenAI(
+                azure_endpoint=self.endpoint,
+                api_key=api_key,
+                api_version=self.api_version,
+                http_client=_http_client
+            )
+
+            self.logger.info("Azure OpenAI client initialized successfully")
+            return client
+        except Exception as e:
+            self.logger.error("Failed to initialize Azure OpenAI client: %s", e)
+            raise
+
+    async def _test_connection(self, client: AsyncAzureOpenAI):
+        """Test the connection to Azure OpenAI"""
+        try:
+            response = await client.chat.completions.create(
+                model=self.deployment_name,
+                messages=[{"role": "user", "content": "Hello"}],
+                max_tokens=5
+            )
+            self.logger.info("Connection test successful")
+        except Exception as e:
+            raise ConnectionError(f"Azure OpenAI connection test failed: {e}")
+
+
+# Global configuration instance
+config = AzureOpenAIConfig()
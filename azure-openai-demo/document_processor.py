@@ -0,0 +1,689 @@
+"""
+Document Processing Service for RAG Implementation
+Handles document ingestion, chunking, embedding, and retrieval for Q&A
+"""
+
+import asyncio
+import collections
+import math
+import mmap
+import os
+import pickle
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+
+import cachetools
+import faiss
+import fitz
+import numpy as np
+import tiktoken
+from langchain.embeddings.openai import OpenAIEmbeddings
+from langchain.vectorstores import FAISS
+from langchain.vectorstores.utils import DistanceStrategy
+from langchain.schema import Document
+
+from config import config
+
+# Embedding requests are network-bound: small batches issued concurrently
+# finish far sooner than one large sequential pass over the same chunks.
+_EMBED_BATCH_SIZE = 16
+_MAX_EMBED_CONCURRENCY = 32
+
+# Semantic query cache: repeat questions whose embeddings are this close
+# (cosine) to a recent one reuse its answer without retrieval or generation.
+_QCACHE_SIM_THRESHOLD = 0.95
+_QCACHE_TTL_SECONDS = 3600
+_QCACHE_MAX_ENTRIES = 1024
+
+# Index layout by corpus size: exact flat search below _QUANTIZE_THRESHOLD,
+# int8 scalar quantization above it (4x smaller, SIMD int8 scan kernels),
+# and IVF partitioning on top once brute force itself is the bottleneck.
+_QUANTIZE_THRESHOLD = 10_000
+_IVF_THRESHOLD = 100_000
+_IVF_NPROBE = 8
+
+# Below this corpus size a single BLAS matmul over a contiguous matrix
+# beats FAISS's generic dispatch for small-k queries.
+_NUMPY_SEARCH_MAX = 50_000
+
+# Context sent to the LLM is capped so a large retrieval set can never
+# overflow the model window; the reserve leaves room for the answer.
+_MODEL_MAX_TOKENS = 8192
+_ANSWER_RESERVE_TOKENS = 500
+
+
+class FastSplitter:
+    """Sliding-window text splitter built on one precompiled separator regex.
+
+    Covers what this service used RecursiveCharacterTextSplitter for —
+    greedy chunks of up to chunk_size characters that end on a separator,
+    with chunk_overlap characters carried into the next chunk — without
+    the per-level list construction and recursion of the LangChain
+    splitter, which shows up in profiles on multi-MB documents.
+    """
+
+    _SEP = re.compile(r'\n\n|\n| ')
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_text(self, text: str) -> List[str]:
+        if len(text) <= self.chunk_size:
+            stripped = text.strip()
+            return [stripped] if stripped else []
+
+        chunks = []
+        start = 0
+        prev_end = 0
+        length = len(text)
+        while start < length:
+            end = start + self.chunk_size
+            if end < length:
+                # End the chunk on the last separator inside the window —
+                # but only if that still moves us past the previous chunk's
+                # end. Otherwise keep the hard cut: an unbroken run longer
+                # than chunk_size - chunk_overlap (URLs, base64, tables)
+                # must not stall the window into emitting duplicates.
+                last_sep = None
+                for match in self._SEP.finditer(text, start, end):
+                    last_sep = match
+                if (last_sep is not None and last_sep.start() > start
+                        and last_sep.start() > prev_end):
+                    end = last_sep.start()
+
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= length:
+                break
+            prev_end = end
+            start = max(end - self.chunk_overlap, start + 1)
+        return chunks
+
+
+@dataclass(slots=True)
+class Hit:
+    """A single retrieval result.
+
+    Slots keep per-hit allocation small at high QPS, and orjson (used by
+    the web layer) serializes dataclasses natively.
+    """
+    content: str
+    metadata: Dict[str, Any]
+    similarity_score: float
+
+
+class DocumentProcessor:
+    """Service for processing documents and implementing RAG"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self.embeddings = OpenAIEmbeddings(
+            azure_endpoint=config.endpoint,
+            api_key=config.api_key,
+            api_version=config.api_version,
+            azure_deployment="text-embedding-ada-002"
+        )
+
+        self.text_splitter = FastSplitter(chunk_size=1000, chunk_overlap=200)
+
+        self.vector_store = None
+        # file name -> chunk count; the FAISS docstore holds the chunks
+        # themselves, so stats never need to walk the corpus
+        self._file_names = collections.Counter()
+        self._embed_semaphore = asyncio.Semaphore(_MAX_EMBED_CONCURRENCY)
+
+        # (unit query vector, inserted_at, cached answer dict), oldest first
+        self._query_cache = []
+
+        # Second cache tier: answers keyed by the exact retrieval set, so
+        # differently-phrased questions that pull the same chunks still hit
+        self._ragset_cache = cachetools.LRUCache(maxsize=10_000)
+
+        # Contiguous (N, d) float32 copy of the indexed unit vectors, in
+        # index order; backs the numpy search path for small corpora
+        self._emb_matrix = None
+
+        self._encoder = None
+
+    @staticmethod
+    def _extract_page(file_path: str, page_num: int) -> str:
+        """Extract one page's text with a private document handle.
+
+        fitz documents are not safe for concurrent access, but separate
+        handles on the same file are, so each worker opens its own.
+        """
+        with fitz.open(file_path) as doc:
+            return doc[page_num].get_text("text")
+
+    def process_pdf(self, file_path: str) -> List[Document]:
+        """
+        Extract text from PDF file, splitting page by page
+
+        Pages are extracted in parallel (PyMuPDF releases the GIL in its C
+        parsing path), then chunked in page order, and every chunk keeps
+        its page number for citation.
+
+        Args:
+            file_path: Path to PDF file
+
+        Returns:
+            List of chunk Documents with page metadata
+        """
+        documents = []
+        try:
+            with fitz.open(file_path) as doc:
+                page_count = doc.page_count
+
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+                page_texts = list(executor.map(
+                    lambda page_num: self._extract_page(file_path, page_num),
+                    range(page_count)
+                ))
+
+            for page_num, page_text in enumerate(page_texts):
+                for chunk in self.text_splitter.split_text(page_text):
+                    documents.append(Document(
+                        page_content=chunk,
+                        metadata={'page': page_num + 1}
+                    ))
+
+            self.logger.info("Processed PDF: %s chunks extracted", len(documents))
+            return documents
+        except Exception as e:
+            self.logger.error("PDF processing failed: %s", e)
+            raise
+
+    def process_text_file(self, file_path: str) -> List[str]:
+        """
+        Process plain text file
+
+        Args:
+            file_path: Path to text file
+
+        Returns:
+            List of text chunks
+        """
+        try:
+            # mmap lets the OS page the file in on demand instead of
+            # allocating a second full copy on the Python heap
+            with open(file_path, 'rb') as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    text = mm[:].decode('utf-8', errors='replace')
+
+            chunks = self.text_splitter.split_text(text)
+            self.logger.info("Processed text file: %s chunks extracted", len(chunks))
+            return chunks
+        except Exception as e:
+            self.logger.error("Text file processing failed: %s", e)
+            raise
+
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts as concurrent micro-batches instead of one sequential pass.
+
+        Texts are length-sorted before batching so each batch holds similarly
+        sized inputs — a short chunk is never padded out to the longest text
+        in its batch — and the vectors are unshuffled back to input order
+        before returning, so callers' metadata stays aligned.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+        batches = [sorted_texts[i:i + _EMBED_BATCH_SIZE]
+                   for i in range(0, len(sorted_texts), _EMBED_BATCH_SIZE)]
+
+        async def _embed_batch(batch: List[str]) -> List[List[float]]:
+            async with self._embed_semaphore:
+                return await self.embeddings.aembed_documents(batch)
+
+        results = await asyncio.gather(*[_embed_batch(batch) for batch in batches])
+        sorted_vectors = [vector for batch_vectors in results for vector in batch_vectors]
+
+        vectors: List[List[float]] = [None] * len(texts)
+        for position, index in enumerate(order):
+            vectors[index] = sorted_vectors[position]
+        return vectors
+
+    async def add_document(self, file_path: str, metadata: Optional[Dict] = None) -> bool:
+        """
+        Add document to the knowledge base
+
+        Args:
+            file_path: Path to document file
+            metadata: Optional metadata for the document
+
+        Returns:
+            Success status
+        """
+        try:
+            file_extension = os.path.splitext(file_path)[1].lower()
+
+            if file_extension == '.pdf':
+                page_documents = self.process_pdf(file_path)
+                chunks = [doc.page_content for doc in page_documents]
+                extra_metadatas = [doc.metadata for doc in page_documents]
+            elif file_extension == '.txt':
+                chunks = self.process_text_file(file_path)
+                extra_metadatas = [{}] * len(chunks)
+            else:
+                raise ValueError(f"Unsupported file type: {file_extension}")
+
+            doc_metadata = {
+                'source': file_path,
+                'file_name': os.path.basename(file_path)
+            }
+            if metadata:
+                doc_metadata.update(metadata)
+
+            documents = []
+            for i, (chunk, extra) in enumerate(zip(chunks, extra_metadatas)):
+                documents.append(Document(
+                    page_content=chunk,
+                    metadata={**doc_metadata, **extra, 'chunk_id': i}
+                ))
+
+            await self._update_vector_store(documents)
+            self._file_names[os.path.basename(file_path)] += len(chunks)
+
+            self.logger.info("Document added successfully: %s chunks", len(chunks))
+            return True
+        except Exception as e:
+            self.logger.error("Failed to add document: %s", e)
+            return False
+
+    async def _update_vector_store(self, new_documents: List[Document]):
+        """Update the vector store with new documents"""
+        try:
+            texts = [doc.page_content for doc in new_documents]
+            metadatas = [doc.metadata for doc in new_documents]
+            vectors = np.asarray(await self._embed_texts(texts), dtype=np.float32)
+            # Unit-length vectors make inner product equal cosine similarity
+            faiss.normalize_L2(vectors)
+
+            if self.vector_store is None:
+                # Inner product over unit vectors is cosine similarity and
+                # runs on FAISS's tighter fused-multiply-add scan kernel
+                self.vector_store = FAISS.from_embeddings(
+                    list(zip(texts, vectors.tolist())),
+                    embedding=self.embeddings,
+                    metadatas=metadatas,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+                    normalize_L2=True
+                )
+            else:
+                # Extend the existing index in place: no throwaway
+                # intermediate index and no copy on merge
+                self.vector_store.add_embeddings(
+                    list(zip(texts, vectors.tolist())),
+                    metadatas=metadatas
+                )
+
+            # The numpy search path is only used below _NUMPY_SEARCH_MAX;
+            # past that the full-precision copy is dead weight (and would
+            # undo the quantized index's memory savings), so drop it.
+            if self.vector_store.index.ntotal >= _NUMPY_SEARCH_MAX:
+                self._emb_matrix = None
+            elif self._emb_matrix is None:
+                self._emb_matrix = vectors.copy()
+            else:
+                self._emb_matrix = np.vstack((self._emb_matrix, vectors))
+
+            self._maybe_compact_index()
+            self.logger.info("Vector store updated successfully")
+        except Exception as e:
+            self.logger.error("Vector store update failed: %s", e)
+            raise
+
+    def _maybe_compact_index(self):
+        """Quantize (and partition) the index as the corpus grows"""
+        index = self.vector_store.index
+        n, d = index.ntotal, index.d
+
+        if n <= _QUANTIZE_THRESHOLD:
+            return
+
+        if n <= _IVF_THRESHOLD:
+            if isinstance(index, faiss.IndexScalarQuantizer):
+                return
+            compact = faiss.IndexScalarQuantizer(
+                d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        else:
+            if isinstance(index, faiss.IndexIVFScalarQuantizer):
+                return
+            nlist = int(4 * math.sqrt(n))
+            compact = faiss.IndexIVFScalarQuantizer(
+                faiss.IndexFlatIP(d), d, nlist,
+                faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+            compact.nprobe = _IVF_NPROBE
+
+        vectors = index.reconstruct_n(0, n)
+        compact.train(vectors)
+        compact.add(vectors)
+
+        self.vector_store.index = compact
+        self.logger.info("Compacted index to %s (%s vectors)",
+                         type(compact).__name__, n)
+
+    def _search_numpy(self, qvec: np.ndarray, k: int):
+        """Top-k cosine search as one BLAS matmul plus an argpartition.
+
+        For corpora under _NUMPY_SEARCH_MAX this stays in a single GEMM
+        call instead of going through FAISS's generic search dispatch.
+        """
+        scores = self._emb_matrix @ qvec
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for idx in top:
+            doc_id = self.vector_store.index_to_docstore_id[int(idx)]
+            doc = self.vector_store.docstore.search(doc_id)
+            results.append((doc, float(scores[idx])))
+        return results
+
+    def search_documents(self, query: str, k: int = 3,
+                         query_vector: Optional[np.ndarray] = None) -> List[Hit]:
+        """
+        Search for relevant documents based on query
+
+        Args:
+            query: Search query
+            k: Number of results to return
+            query_vector: Precomputed query embedding; passing it skips
+                re-embedding the query inside the vector store
+
+        Returns:
+            List of relevant document chunks with metadata; similarity_score
+            is cosine similarity in [-1, 1], higher is better
+        """
+        try:
+            if not self.vector_store:
+                return []
+
+            if (query_vector is not None and self._emb_matrix is not None
+                    and len(self._emb_matrix) < _NUMPY_SEARCH_MAX):
+                results = self._search_numpy(
+                    np.asarray(query_vector, dtype=np.float32), k)
+            elif query_vector is not None:
+                results = self.vector_store.similarity_search_with_score_by_vector(
+                    list(query_vector), k=k)
+            else:
+                results = self.vector_store.similarity_search_with_score(query, k=k)
+
+            formatted_results = [
+                Hit(content=doc.page_content,
+                    metadata=doc.metadata,
+                    similarity_score=float(score))
+                for doc, score in results
+            ]
+
+            self.logger.info("Document search completed: %s results", len(formatted_results))
+            return formatted_results
+        except Exception as e:
+            self.logger.error("Document search failed: %s", e)
+            return []
+
+    async def _embed_query(self, question: str) -> np.ndarray:
+        """Embed a query once and normalize it for cosine comparisons"""
+        qvec = np.asarray(await self.embeddings.aembed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(qvec)
+        if norm:
+            qvec /= norm
+        return qvec
+
+    def _query_cache_lookup(self, qvec: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Return the cached answer of a semantically similar recent question"""
+        now = time.monotonic()
+        self._query_cache = [entry for entry in self._query_cache
+                             if now - entry[1] < _QCACHE_TTL_SECONDS]
+        if not self._query_cache:
+            return None
+
+        scores = np.stack([entry[0] for entry in self._query_cache]) @ qvec
+        best = int(np.argmax(scores))
+        if scores[best] >= _QCACHE_SIM_THRESHOLD:
+            self.logger.info("Semantic query cache hit (similarity %.3f)", scores[best])
+            return self._query_cache[best][2]
+        return None
+
+    def _query_cache_insert(self, qvec: np.ndarray, result: Dict[str, Any]):
+        if len(self._query_cache) >= _QCACHE_MAX_ENTRIES:
+            self._query_cache.pop(0)
+        self._query_cache.append((qvec, time.monotonic(), result))
+
+    async def search_documents_batch(self, queries: List[str], k: int = 3) -> List[List[Hit]]:
+        """
+        Search for several queries in one pass
+
+        The queries share a single concurrent embedding pass and a single
+        FAISS search over the stacked query matrix, amortizing the network
+        round trip and the index setup across the whole batch.
+
+        Args:
+            queries: Search queries
+            k: Number of results per query
+
+        Returns:
+            One list of Hits per query, in input order
+        """
+        try:
+            if not self.vector_store or not queries:
+                return [[] for _ in queries]
+
+            xq = np.asarray(await self._embed_texts(queries), dtype=np.float32)
+            faiss.normalize_L2(xq)
+            scores, indices = self.vector_store.index.search(xq, k)
+
+            batched_results = []
+            for row_scores, row_indices in zip(scores, indices):
+                hits = []
+                for score, idx in zip(row_scores, row_indices):
+                    if idx == -1:
+                        continue
+                    doc_id = self.vector_store.index_to_docstore_id[int(idx)]
+                    doc = self.vector_store.docstore.search(doc_id)
+                    hits.append(Hit(
+                        content=doc.page_content,
+                        # Copy without underscore-prefixed internals (the
+                        # _tokens memo) — these hits are serialized verbatim
+                        # by /api/search/batch
+                        metadata={k: v for k, v in doc.metadata.items()
+                                  if not k.startswith('_')},
+                        similarity_score=float(score)
+                    ))
+                batched_results.append(hits)
+
+            self.logger.info("Batch document search completed: %s queries", len(queries))
+            return batched_results
+        except Exception as e:
+            self.logger.error("Batch document search failed: %s", e)
+            return [[] for _ in queries]
+
+    @property
+    def encoder(self):
+        """Lazily-created tiktoken encoder for the configured deployment"""
+        if self._encoder is None:
+            try:
+                self._encoder = tiktoken.encoding_for_model(config.deployment_name)
+            except KeyError:
+                self._encoder = tiktoken.get_encoding("cl100k_base")
+        return self._encoder
+
+    def _doc_tokens(self, doc: Hit) -> int:
+        """Token count of a retrieved chunk, memoized in its metadata.
+
+        The metadata dict is shared with the docstore entry, so each chunk
+        is encoded at most once per process.
+        """
+        tokens = doc.metadata.get('_tokens')
+        if tokens is None:
+            tokens = len(self.encoder.encode(doc.content))
+            doc.metadata['_tokens'] = tokens
+        return tokens
+
+    def _fit_context_budget(self, question: str,
+                            relevant_docs: List[Hit]) -> List[Hit]:
+        """Keep the most relevant chunks that fit the model's token window"""
+        budget = (_MODEL_MAX_TOKENS
+                  - len(self.encoder.encode(question))
+                  - _ANSWER_RESERVE_TOKENS)
+
+        selected = []
+        used = 0
+        for doc in relevant_docs:
+            tokens = self._doc_tokens(doc)
+            if used + tokens > budget:
+                break
+            selected.append(doc)
+            used += tokens
+
+        # Never send an empty context: a single oversized chunk is better
+        # truncated by the model than dropped entirely
+        return selected or relevant_docs[:1]
+
+    async def answer_question(self, question: str, context_limit: int = 3) -> Dict[str, Any]:
+        """
+        Answer a question using RAG (Retrieval Augmented Generation)
+
+        Args:
+            question: Question to answer
+            context_limit: Number of document chunks to use as context
+
+        Returns:
+            Dictionary with answer and source information
+        """
+        try:
+            qvec = await self._embed_query(question)
+            cached = self._query_cache_lookup(qvec)
+            if cached is not None:
+                return cached
+
+            relevant_docs = self.search_documents(question, k=context_limit,
+                                                  query_vector=qvec)
+
+            if not relevant_docs:
+                return {
+                    'answer': "I don't have enough information to answer that question.",
+                    'sources': [],
+                    'confidence': 0.0
+                }
+
+            # Trim to the token budget in relevance order first, then apply
+            # the stable ordering: identical retrieval sets produce
+            # byte-identical prompt prefixes, so the provider's server-side
+            # prompt cache can skip re-prefilling the context. The variable
+            # part — the question — goes last, in the user message.
+            relevant_docs = self._fit_context_budget(question, relevant_docs)
+            relevant_docs.sort(key=lambda doc: (doc.metadata.get('file_name', ''),
+                                                doc.metadata.get('chunk_id', 0)))
+            context = "\n\n".join(
+                f"Source: {doc.metadata.get('file_name', 'Unknown')}\n{doc.content}"
+                for doc in relevant_docs
+            )
+
+            sources = [
+                {
+                    'file_name': doc.metadata.get('file_name', 'Unknown'),
+                    'similarity_score': doc.similarity_score
+                }
+                for doc in relevant_docs
+            ]
+            confidence = max([doc.similarity_score for doc in relevant_docs])
+
+            ragset_key = tuple(
+                (doc.metadata.get('file_name', ''), doc.metadata.get('chunk_id', 0))
+                for doc in relevant_docs
+            )
+            cached_answer = self._ragset_cache.get(ragset_key)
+            if cached_answer is not None:
+                self.logger.info("Retrieval-set answer cache hit")
+                result = {
+                    'answer': cached_answer,
+                    'sources': sources,
+                    'confidence': confidence
+                }
+                self._query_cache_insert(qvec, result)
+                return result
+
+            from ai_service import AIService
+            ai_service = AIService()
+
+            system_prompt = (
+                "You are a helpful assistant that answers questions based on the "
+                "provided context. Use only the information from the context to "
+                "answer questions. If the context doesn't contain enough "
+                "information, say so clearly.\n\n"
+                "Context:\n"
+                f"{context}"
+            )
+
+            answer = await ai_service.chat_completion(
+                message=question,
+                system_prompt=system_prompt,
+                temperature=0.1
+            )
+
+            self._ragset_cache[ragset_key] = answer
+
+            result = {
+                'answer': answer,
+                'sources': sources,
+                'confidence': confidence
+            }
+            self._query_cache_insert(qvec, result)
+            return result
+        except Exception as e:
+            self.logger.error("Question answering failed: %s", e)
+            return {
+                'answer': f"Error processing question: {str(e)}",
+                'sources': [],
+                'confidence': 0.0
+            }
+
+    def get_document_stats(self) -> Dict[str, Any]:
+        """Get statistics about processed documents"""
+        return {
+            'total_documents': len(self._file_names),
+            'total_chunks': sum(self._file_names.values()),
+            'has_vector_store': self.vector_store is not None,
+            'document_list': list(self._file_names)
+        }
+
+    def save_vector_store(self, path: str):
+        """Save vector store to disk"""
+        if self.vector_store:
+            self.vector_store.save_local(path)
+            self.logger.info("Vector store saved to %s", path)
+
+    def load_vector_store(self, path: str):
+        """Load vector store from disk, memory-mapping the index arrays.
+
+        The mmap'd read keeps the vectors in the page cache, so under
+        gunicorn's preload_app the forked workers share one copy of the
+        index instead of duplicating it per process.
+        """
+        try:
+            index = faiss.read_index(os.path.join(path, "index.faiss"),
+                                     faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            with open(os.path.join(path, "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+
+            self.vector_store = FAISS(
+                embedding_function=self.embeddings,
+                index=index,
+                docstore=docstore,
+                index_to_docstore_id=index_to_docstore_id,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+                normalize_L2=True
+            )
+            if 0 < index.ntotal < _NUMPY_SEARCH_MAX:
+                self._emb_matrix = index.reconstruct_n(0, index.ntotal)
+            self.logger.info("Vector store loaded from %s", path)
+        except Exception as e:
+            self.logger.error("Failed to load vector store: %s", e)
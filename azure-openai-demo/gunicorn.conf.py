@@ -0,0 +1,28 @@
+"""Gunicorn configuration for the Azure OpenAI demo backend"""
+
+import multiprocessing
+
+bind = "0.0.0.0:5000"
+
+# Quart is an ASGI app, so it must run under an async worker; the sync
+# worker would serialize every request. The request path is I/O-bound
+# (Azure OpenAI chat and embedding round trips), so a handful of workers
+# is enough and each one multiplexes many in-flight requests — including
+# the concurrent embedding micro-batches — on its event loop.
+workers = multiprocessing.cpu_count() * 2 + 1
+worker_class = "uvicorn.workers.UvicornWorker"
+worker_connections = 1000
+timeout = 120
+
+# Longer than typical load-balancer idle timeouts so upstream proxies
+# reuse connections instead of reopening one per request.
+keepalive = 75
+
+# With preload_app the application module is imported once in the master,
+# so the FAISS vector store (pointed at by the VECTOR_STORE_PATH env var)
+# is loaded a single time and shared copy-on-write across workers.
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+loglevel = "info"